@@ -14,6 +14,15 @@ OUTPUT_PATH = PROJECT_ROOT / "output"
 # Model settings
 MODEL_CONFIDENCE = 0.25
 MODEL_IOU_THRESHOLD = 0.45
+MODEL_BACKEND = 'pt'     # 'pt' (PyTorch), 'onnx' or 'engine' (TensorRT, exported once per export settings next to MODEL_PATH)
+MODEL_HALF = True        # Export ONNX/TensorRT models in FP16
+MODEL_INT8 = False       # Export TensorRT engine in INT8 (MODEL_BACKEND='engine' only)
+MODEL_CALIBRATION_DATA = None  # INT8 calibration dataset yaml; None samples 200 frames from VIDEO_PATH
+# Inference input size; None uses the checkpoint's training size (800 for best.pt).
+# 640 feeds ~1.6x fewer pixels (faster) but may miss small items the model learned at 800.
+INFER_IMGSZ = None
+BATCH_SIZE = 4           # Frames per inference call (also the static batch of exported models)
+PINNED_INPUT = False     # Upload frames through reusable pinned/device buffers (MODEL_BACKEND='engine' on CUDA only; benchmark before enabling)
 
 # Tracking settings
 TRACK_ACTIVATION_THRESHOLD = 0.25
@@ -30,6 +39,9 @@ MIN_DETECTION_SIZE = 50  # Minimum size for detection (pixels)
 # Video processing settings
 FRAME_SKIP = 1  # Process every Nth frame
 OUTPUT_FPS = 30
+USE_HW_DECODE = True     # Decode with NVDEC via decord when available (falls back to OpenCV)
+USE_HW_ENCODE = True     # Encode with NVENC via PyAV when available (falls back to OpenCV)
+PIPELINE_QUEUE_SIZE = 8  # Frames buffered between decode / inference / encode threads
 
 # Detection classes (hygiene products)
 HYGIENE_CLASSES = [
@@ -15,7 +15,7 @@ sys.path.append(str(project_root))
 from config import *
 from models.detector import HygieneDetector
 from tracking.tracker import HygieneTracker
-from utils.video_processor import VideoProcessor, VideoAnnotator
+from utils.video_processor import VideoProcessor, VideoAnnotator, ThreadedFrameReader, ThreadedWriter
 
 def main():
     """Main function for detection and tracking"""
@@ -44,7 +44,15 @@ def main():
         detector = HygieneDetector(
             model_path=str(MODEL_PATH),
             confidence=MODEL_CONFIDENCE,
-            iou_threshold=MODEL_IOU_THRESHOLD
+            iou_threshold=MODEL_IOU_THRESHOLD,
+            backend=MODEL_BACKEND,
+            half=MODEL_HALF,
+            int8=MODEL_INT8,
+            calibration_data=MODEL_CALIBRATION_DATA,
+            calibration_video=str(VIDEO_PATH),
+            batch_size=BATCH_SIZE,
+            imgsz=INFER_IMGSZ,
+            pinned_input=PINNED_INPUT
         )
         
         # Hygiene products tracker
@@ -61,11 +69,13 @@ def main():
         output_video_path = OUTPUT_PATH / "output_video.mp4"
         processor = VideoProcessor(
             video_path=str(VIDEO_PATH),
-            output_path=str(output_video_path)
+            output_path=str(output_video_path),
+            hw_decode=USE_HW_DECODE,
+            hw_encode=USE_HW_ENCODE
         )
         
         # Video annotator
-        annotator = VideoAnnotator()
+        annotator = VideoAnnotator(class_names=detector.get_class_names())
         
         # Setup video writer
         writer = processor.setup_video_writer(
@@ -73,6 +83,13 @@ def main():
             fps=OUTPUT_FPS
         )
         
+        # Decode and encode on background threads so they overlap with inference
+        frame_reader = ThreadedFrameReader(
+            processor.get_batch_generator(frame_skip=FRAME_SKIP, batch_size=BATCH_SIZE),
+            queue_size=max(1, PIPELINE_QUEUE_SIZE // BATCH_SIZE)
+        )
+        frame_writer = ThreadedWriter(processor, queue_size=PIPELINE_QUEUE_SIZE)
+        
         print("\n Starting video processing...")
         start_time = time.time()
         
@@ -80,38 +97,43 @@ def main():
         frame_count = 0
         processed_frames = 0
         
-        for frame_num, frame in processor.get_frame_generator(frame_skip=FRAME_SKIP):
-            frame_count += 1
-            
-            # Hygiene products detection
-            frame, detections = detector.detect_frame(frame)
-            
-            # Hygiene products tracking
-            detections = tracker.update_tracks(detections, frame)
-            
-            # Annotate frame
-            frame = annotator.annotate_frame(frame, detections, detector, tracker)
+        for batch in frame_reader:
+            frames = [frame for _, frame in batch]
             
-            # No counting line annotation needed
+            # Hygiene products detection (one inference call per batch)
+            batch_detections = detector.detect_frames(frames)
             
-            # Write frame to output video
-            processor.write_frame(frame)
-            processed_frames += 1
-            
-            # Progress update with grabbed item info
-            if frame_count % 100 == 0:
-                elapsed = time.time() - start_time
-                fps = processed_frames / elapsed
+            # Track sequentially in original order to preserve ByteTrack state
+            for frame, detections in zip(frames, batch_detections):
+                frame_count += 1
+                
+                # Hygiene products tracking
+                detections = tracker.update_tracks(detections, frame)
+                
+                # Annotate frame
+                frame = annotator.annotate_frame(frame, detections, detector, tracker)
                 
-                # Get current grabbed item info
-                grabbed_item = tracker.get_grabbed_item_info()
-                if grabbed_item:
-                    item_info = f"Grabbed: {detector.get_class_names().get(grabbed_item['class_id'], 'Unknown')} #{grabbed_item['track_id']}"
-                    print(f" Processed {frame_count} frames, FPS: {fps:.2f} | {item_info}")
-                else:
-                    print(f" Processed {frame_count} frames, FPS: {fps:.2f}")
+                # No counting line annotation needed
+                
+                # Write frame to output video
+                frame_writer.write(frame)
+                processed_frames += 1
+                
+                # Progress update with grabbed item info
+                if frame_count % 100 == 0:
+                    elapsed = time.time() - start_time
+                    fps = processed_frames / elapsed
+                    
+                    # Get current grabbed item info
+                    grabbed_item = tracker.get_grabbed_item_info()
+                    if grabbed_item:
+                        item_info = f"Grabbed: {detector.get_class_names().get(grabbed_item['class_id'], 'Unknown')} #{grabbed_item['track_id']}"
+                        print(f" Processed {frame_count} frames, FPS: {fps:.2f} | {item_info}")
+                    else:
+                        print(f" Processed {frame_count} frames, FPS: {fps:.2f}")
         
         # Cleanup
+        frame_writer.close()
         processor.close_writer()
         
         # Final statistics
@@ -142,14 +164,24 @@ def main():
         
     except KeyboardInterrupt:
         print("\n Processing interrupted by user")
-        if 'processor' in locals():
-            processor.close_writer()
+        _shutdown_pipeline(locals())
     except Exception as e:
         print(f"\n Error during processing: {e}")
-        if 'processor' in locals():
-            processor.close_writer()
+        _shutdown_pipeline(locals())
         raise
 
+def _shutdown_pipeline(components: dict):
+    """Stop background threads and close the video writer after an early exit"""
+    if 'frame_reader' in components:
+        components['frame_reader'].stop()
+    if 'frame_writer' in components:
+        try:
+            components['frame_writer'].close()
+        except Exception as e:
+            print(f" Error flushing video writer: {e}")
+    if 'processor' in components:
+        components['processor'].close_writer()
+
 def run_single_frame_test():
     """Test detection and tracking on a single frame"""
     print(" Running single frame test...")
@@ -3,7 +3,11 @@ Detection Module using YOLOv8
 """
 
 import os
+import cv2
 import numpy as np
+import torch
+import yaml
+from pathlib import Path
 from ultralytics import YOLO
 from typing import List, Tuple, Dict, Any
 import supervision as sv
@@ -12,7 +16,16 @@ from config import HYGIENE_CLASSES
 class HygieneDetector:
     """Hygiene products detection using YOLOv8 model"""
     
-    def __init__(self, model_path: str, confidence: float = 0.25, iou_threshold: float = 0.45):
+    # File suffix produced by Ultralytics for each export format
+    EXPORT_SUFFIXES = {'engine': '.engine', 'onnx': '.onnx'}
+    
+    # Number of video frames sampled for INT8 calibration
+    CALIBRATION_FRAMES = 200
+    
+    def __init__(self, model_path: str, confidence: float = 0.25, iou_threshold: float = 0.45,
+                 backend: str = 'pt', half: bool = True, int8: bool = False,
+                 calibration_data: str = None, calibration_video: str = None,
+                 batch_size: int = 1, imgsz: int = None, pinned_input: bool = False):
         """
         Initialize detector
         
@@ -20,26 +33,180 @@ class HygieneDetector:
             model_path: Path to YOLOv8 model weights
             confidence: Detection confidence threshold
             iou_threshold: IoU threshold for NMS
+            backend: Inference backend ('pt', 'onnx' or 'engine')
+            half: Export ONNX/TensorRT model in FP16
+            int8: Export TensorRT engine in INT8 (ignored for other backends)
+            calibration_data: Dataset yaml used for INT8 calibration
+            calibration_video: Video to sample INT8 calibration frames from when
+                calibration_data is None
+            batch_size: Number of frames per inference call
+            imgsz: Inference input size (uses the checkpoint's training size if None)
+            pinned_input: Upload frames through preallocated pinned/device tensors
+                (TensorRT engine on CUDA only)
         """
+        if backend != 'pt' and backend not in self.EXPORT_SUFFIXES:
+            raise ValueError(f"Unsupported model backend: {backend}")
+        
         self.model_path = model_path
         self.confidence = confidence
         self.iou_threshold = iou_threshold
+        self.backend = backend
+        self.half = half
+        self.int8 = int8 and backend == 'engine'
+        self.calibration_data = calibration_data
+        self.calibration_video = calibration_video
+        self.batch_size = batch_size
+        self.imgsz = imgsz
+        # Only static-shape engines take the same square letterbox Ultralytics would use;
+        # for 'pt' its LetterBox(auto=True) picks a smaller stride-aligned rectangle
+        self.pinned_input = pinned_input and backend == 'engine' and torch.cuda.is_available()
         self.model = None
         self.class_names = {}
         
         self._load_model()
+        self._hygiene_lut = self._build_hygiene_lut()
+        # Class ids kept by NMS. The shipped best.pt only has hygiene classes
+        # (hand, packet, pad, tampon; no 'background'), so this is None and NMS
+        # skips class filtering; a list is only passed for weights with extra classes
+        self._keep_ids = None if self._hygiene_lut.all() else np.flatnonzero(self._hygiene_lut).tolist()
+        
+        if self.pinned_input:
+            self._setup_input_buffers()
     
     def _load_model(self):
         """Load YOLOv8 model"""
         try:
-            print(f" Loading model from: {self.model_path}")
-            self.model = YOLO(self.model_path)
-            self.class_names = self.model.model.names
+            weights_path = self._resolve_weights_path()
+            print(f" Loading model from: {weights_path}")
+            self.model = YOLO(weights_path, task='detect')
+            if self.imgsz is None:
+                # Only reached for 'pt'; export backends resolve imgsz before naming the file
+                self.imgsz = self._checkpoint_imgsz(self.model)
+            self.class_names = self.model.names
             print(f" Model loaded successfully! Classes: {len(self.class_names)}")
         except Exception as e:
             print(f" Error loading model: {e}")
             raise
     
+    @staticmethod
+    def _checkpoint_imgsz(pt_model: YOLO) -> int:
+        """Get the training image size stored in a loaded .pt checkpoint (Ultralytics' own predict default)"""
+        imgsz = pt_model.overrides.get('imgsz', 640)
+        return max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+    
+    def _setup_input_buffers(self):
+        """Preallocate pinned host and device input buffers reused by every batch"""
+        raw_shape = (self.batch_size, self.imgsz, self.imgsz, 3)
+        input_shape = (self.batch_size, 3, self.imgsz, self.imgsz)
+        
+        # Build the predictor once so the loaded backend reports its real input dtype
+        blank = np.zeros((self.imgsz, self.imgsz, 3), dtype=np.uint8)
+        self.model([blank] * self.batch_size, imgsz=self.imgsz, verbose=False)
+        dtype = torch.float16 if self.model.predictor.model.fp16 else torch.float32
+        
+        # Frames are letterboxed straight into pinned memory as BGR HWC uint8
+        self._pinned = torch.empty(raw_shape, dtype=torch.uint8, pin_memory=True).fill_(114)
+        self._pinned_frames = self._pinned.numpy()
+        self._letterbox_regions = [None] * self.batch_size  # (top, left, height, width) per slot
+        
+        self._dev_raw = torch.empty(raw_shape, dtype=torch.uint8, device='cuda')
+        self._dev = torch.empty(input_shape, dtype=dtype, device='cuda')
+    
+    def _build_hygiene_lut(self) -> np.ndarray:
+        """Build boolean lookup table indexed by class_id marking hygiene product and hand classes"""
+        hygiene_classes = {cls for cls in HYGIENE_CLASSES if cls != 'background'}
+        
+        hygiene_lut = np.zeros(max(self.class_names) + 1, dtype=bool)
+        for class_id, class_name in self.class_names.items():
+            hygiene_lut[class_id] = class_name in hygiene_classes
+        
+        return hygiene_lut
+    
+    def _resolve_weights_path(self) -> str:
+        """Get weights for the configured backend, exporting them once if missing"""
+        if self.backend == 'pt':
+            return self.model_path
+        
+        # The .pt is only loaded here when its imgsz names the exported file or an export is needed
+        pt_model = None
+        if self.imgsz is None:
+            pt_model = YOLO(self.model_path)
+            self.imgsz = self._checkpoint_imgsz(pt_model)
+        
+        exported_path = self._exported_weights_path()
+        if not exported_path.exists():
+            print(f" Exporting {self.backend} model from: {self.model_path}")
+            pt_model = pt_model or YOLO(self.model_path)
+            export_args = {
+                'format': self.backend,
+                'half': self.half,
+                'dynamic': False,
+                'batch': self.batch_size,
+                'imgsz': self.imgsz,
+            }
+            if self.int8:
+                calibration_data = self.calibration_data or self._build_calibration_data(pt_model.names)
+                export_args.update(int8=True, data=str(calibration_data))
+            
+            # Ultralytics always writes e.g. best.engine; move it to the settings-specific name
+            Path(pt_model.export(**export_args)).replace(exported_path)
+        
+        return str(exported_path)
+    
+    def _exported_weights_path(self) -> Path:
+        """
+        Get exported model path next to the .pt weights, named after its export settings
+        (e.g. best_b4_640_fp16.engine) so a settings change triggers a fresh export
+        """
+        if self.int8:
+            precision = 'int8'
+        else:
+            precision = 'fp16' if self.half else 'fp32'
+        
+        weights_path = Path(self.model_path)
+        return weights_path.with_name(
+            f"{weights_path.stem}_b{self.batch_size}_{self.imgsz}_{precision}"
+            f"{self.EXPORT_SUFFIXES[self.backend]}"
+        )
+    
+    def _build_calibration_data(self, class_names: Dict[int, str]) -> Path:
+        """Sample frames evenly from the calibration video and write an INT8 calibration dataset yaml"""
+        if self.calibration_video is None:
+            raise ValueError("INT8 export requires calibration data or a calibration video")
+        
+        calibration_dir = Path(self.model_path).parent / "calibration"
+        images_dir = calibration_dir / "images"
+        images_dir.mkdir(parents=True, exist_ok=True)
+        
+        cap = cv2.VideoCapture(str(self.calibration_video))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_indices = np.unique(np.linspace(0, max(total_frames - 1, 0), self.CALIBRATION_FRAMES, dtype=int))
+        
+        num_saved = 0
+        for frame_idx in frame_indices:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_idx))
+            ret, frame = cap.read()
+            if not ret:
+                break
+            cv2.imwrite(str(images_dir / f"frame_{frame_idx:06d}.jpg"), frame)
+            num_saved += 1
+        cap.release()
+        
+        if num_saved == 0:
+            raise ValueError(f"Could not read calibration frames from: {self.calibration_video}")
+        print(f" Sampled {num_saved} calibration frames from: {self.calibration_video}")
+        
+        data_path = calibration_dir / "calibration.yaml"
+        with open(data_path, 'w') as f:
+            yaml.safe_dump({
+                'path': str(calibration_dir),
+                'train': 'images',
+                'val': 'images',
+                'names': dict(class_names),
+            }, f)
+        
+        return data_path
+    
     def detect_frame(self, frame: np.ndarray) -> Tuple[np.ndarray, sv.Detections]:
         """
         Detect hygiene in a single frame
@@ -50,36 +217,110 @@ class HygieneDetector:
         Returns:
             Tuple of (annotated_frame, detections)
         """
+        return frame, self.detect_frames([frame])[0]
+    
+    def detect_frames(self, frames: List[np.ndarray]) -> List[sv.Detections]:
+        """
+        Detect hygiene in a batch of frames with a single inference call
+        
+        Args:
+            frames: Input frames (numpy arrays)
+            
+        Returns:
+            List of detections, one per input frame
+        """
         if self.model is None:
             raise ValueError("Model not loaded")
         
-        # Run inference
-        results = self.model(frame, conf=self.confidence, iou=self.iou_threshold, verbose=False)
+        num_frames = len(frames)
+        if num_frames == 0:
+            return []
+        
+        # Exported models have a static batch size, so pad partial batches
+        batch = list(frames)
+        if self.backend != 'pt' and num_frames < self.batch_size:
+            batch.extend([frames[-1]] * (self.batch_size - num_frames))
         
-        # Convert to supervision format
-        detections = sv.Detections.from_ultralytics(results[0])
+        if self.pinned_input and len(batch) <= self.batch_size:
+            return self._detect_pinned(batch, num_frames)
         
-        # Filter for hygiene product classes only
-        hygiene_detections = self._filter_hygiene_detections(detections)
+        # Run inference (classes= only restricts output for weights with non-hygiene classes)
+        results = self.model(batch, imgsz=self.imgsz, conf=self.confidence, iou=self.iou_threshold,
+                             classes=self._keep_ids, verbose=False)
         
-        return frame, hygiene_detections
+        # Convert to supervision format (boxes are already rescaled to the original frame)
+        return [sv.Detections.from_ultralytics(result) for result in results[:num_frames]]
     
-    def _filter_hygiene_detections(self, detections: sv.Detections) -> sv.Detections:
-        """Filter detections to only include hygiene products and hands"""
-        if len(detections) == 0:
-            return detections
+    def _detect_pinned(self, batch: List[np.ndarray], num_frames: int) -> List[sv.Detections]:
+        """
+        Run a static-shape engine on a device tensor filled through the pinned host buffer
+        
+        The engine's fixed (batch, 3, imgsz, imgsz) input is the same square letterbox
+        Ultralytics would build for it, so only the preprocessing location changes
+        """
+        batch_len = len(batch)
+        transforms = []
         
-        # Get class names for detected objects
-        class_names = [self.class_names[class_id] for class_id in detections.class_id]
+        for i, frame in enumerate(batch):
+            transforms.append(self._letterbox_frame(frame, i))
+        
+        # Upload uint8 (a quarter of the float bytes) and convert on the GPU
+        raw_input = self._dev_raw[:batch_len]
+        raw_input.copy_(self._pinned[:batch_len], non_blocking=True)
+        device_input = self._preprocess_on_device(raw_input)
+        
+        # Tensor input skips Ultralytics' letterbox, so boxes come back in letterbox coordinates
+        results = self.model(device_input, conf=self.confidence, iou=self.iou_threshold,
+                             classes=self._keep_ids, verbose=False)
+        
+        detections_list = []
+        for result, (gain, left, top, width, height) in zip(results[:num_frames], transforms):
+            detections = sv.Detections.from_ultralytics(result)
+            if len(detections) > 0:
+                xyxy = (detections.xyxy - (left, top, left, top)) / gain
+                xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, width)
+                xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, height)
+                detections.xyxy = xyxy.astype(np.float32)
+            detections_list.append(detections)
+        
+        return detections_list
+    
+    def _preprocess_on_device(self, raw_input: torch.Tensor) -> torch.Tensor:
+        """Convert BGR NHWC uint8 to RGB NCHW in [0, 1] in the engine's input dtype"""
+        device_input = self._dev[:len(raw_input)]
+        
+        # Each channel is cast and written once in reversed order (BGR -> RGB, HWC -> CHW)
+        for channel in range(3):
+            device_input[:, channel].copy_(raw_input[..., 2 - channel])
+        
+        return device_input.div_(255.0)
+    
+    def _letterbox_frame(self, frame: np.ndarray, slot: int) -> Tuple[float, int, int, int, int]:
+        """
+        Resize frame into its pinned buffer slot, padding like Ultralytics'
+        LetterBox(auto=False) does for static-shape engines
+        
+        Returns:
+            Tuple of (gain, left, top, frame_width, frame_height) to map boxes back
+        """
+        height, width = frame.shape[:2]
+        gain = min(self.imgsz / height, self.imgsz / width)
+        new_width, new_height = round(width * gain), round(height * gain)
+        left = round((self.imgsz - new_width) / 2 - 0.1)
+        top = round((self.imgsz - new_height) / 2 - 0.1)
         
-        # Remove 'background' from detection classes
-        hygiene_classes = [cls for cls in HYGIENE_CLASSES if cls != 'background']
-        hygiene_mask = [name in hygiene_classes for name in class_names]
+        # Padding only needs resetting when the frame size changes
+        letterbox = self._pinned_frames[slot]
+        region = (top, left, new_height, new_width)
+        if region != self._letterbox_regions[slot]:
+            letterbox.fill(114)
+            self._letterbox_regions[slot] = region
         
-        # Apply mask to filter detections
-        filtered_detections = detections[hygiene_mask]
+        cv2.resize(frame, (new_width, new_height),
+                   dst=letterbox[top:top + new_height, left:left + new_width],
+                   interpolation=cv2.INTER_LINEAR)
         
-        return filtered_detections
+        return gain, left, top, width, height
     
     def get_class_names(self) -> Dict[int, str]:
         """Get class names dictionary"""
@@ -89,8 +330,11 @@ class HygieneDetector:
         """Get model information"""
         return {
             'model_path': self.model_path,
+            'backend': self.backend,
             'confidence_threshold': self.confidence,
             'iou_threshold': self.iou_threshold,
+            'imgsz': self.imgsz,
+            'pinned_input': self.pinned_input,
             'num_classes': len(self.class_names),
             'classes': self.class_names
         } 
\ No newline at end of file
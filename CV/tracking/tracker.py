@@ -2,12 +2,88 @@
 Tracking Module using ByteTrack
 """
 
+import math
 import numpy as np
 import supervision as sv
 from typing import List, Tuple, Dict, Optional
 from config import TRAJECTORY_HISTORY_LENGTH, MIN_TRAJECTORY_LENGTH, MIN_MOVEMENT_THRESHOLD
 
 
+class TrackBuffer:
+    """Fixed-size ring buffer of a track's recent positions stored as parallel arrays"""
+    
+    # One buffer per track is created, so drop the per-instance __dict__
+    __slots__ = ('capacity', 'frame', 'x', 'y', 'cls', 'seg_len', 'length_total', 'head', 'size')
+    
+    def __init__(self, capacity: int = TRAJECTORY_HISTORY_LENGTH):
+        """
+        Initialize track buffer
+        
+        Args:
+            capacity: Maximum number of positions kept (oldest are overwritten)
+        """
+        self.capacity = capacity
+        self.frame = np.empty(capacity, dtype=np.int32)
+        self.x = np.empty(capacity, dtype=np.float32)
+        self.y = np.empty(capacity, dtype=np.float32)
+        self.cls = np.empty(capacity, dtype=np.int32)
+        self.seg_len = np.zeros(capacity, dtype=np.float64)  # Distance from the previous position
+        self.length_total = 0.0  # Trajectory length over the buffered positions
+        self.head = 0  # Slot the next position is written to
+        self.size = 0
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def append(self, frame_num: int, x: float, y: float, class_id: int):
+        """Append position, overwriting the oldest one when full"""
+        i = self.head
+        
+        # Evict the oldest position; the next one becomes oldest and loses its incoming segment
+        if self.size == self.capacity:
+            oldest = (i + 1) % self.capacity
+            self.length_total -= self.seg_len[oldest]
+            self.seg_len[oldest] = 0.0
+            self.size -= 1
+        
+        # Keep the trajectory length up to date with the new segment
+        segment = math.hypot(x - self.x[i - 1], y - self.y[i - 1]) if self.size > 0 else 0.0
+        self.seg_len[i] = segment
+        self.length_total += segment
+        
+        self.frame[i] = frame_num
+        self.x[i] = x
+        self.y[i] = y
+        self.cls[i] = class_id
+        
+        self.head = (i + 1) % self.capacity
+        self.size += 1
+    
+    def _ordered(self, values: np.ndarray) -> np.ndarray:
+        """Get values oldest-first (a view until the buffer has wrapped)"""
+        if self.size < self.capacity:
+            return values[:self.size]
+        return np.concatenate((values[self.head:], values[:self.head]))
+    
+    def get_view(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Get (x, y) positions oldest-first"""
+        return self._ordered(self.x), self._ordered(self.y)
+    
+    @property
+    def first_frame(self) -> int:
+        """Frame number of the oldest position"""
+        return int(self.frame[0 if self.size < self.capacity else self.head])
+    
+    @property
+    def last_frame(self) -> int:
+        """Frame number of the newest position"""
+        return int(self.frame[self.head - 1])
+    
+    @property
+    def last_class_id(self) -> int:
+        """Class id of the newest position"""
+        return int(self.cls[self.head - 1])
+
 
 class HygieneTracker:
     """Hygiene products tracking using ByteTrack"""
@@ -31,6 +107,12 @@ class HygieneTracker:
         self.track_frame_rate = track_frame_rate
         self.detector = detector
         
+        # Resolve class names once; hands are skipped by class_id in the hot loop
+        self._class_names = detector.get_class_names() if detector else {}
+        self._hand_cls_id = next(
+            (class_id for class_id, name in self._class_names.items() if name == 'hand'), -1
+        )
+        
         # Initialize ByteTracker
         self.tracker = sv.ByteTrack(
             track_activation_threshold=track_activation_threshold,
@@ -39,7 +121,7 @@ class HygieneTracker:
         )
         
         # Trajectory analysis data structures
-        self.track_history = {}  # {track_id: [(frame_num, x, y, class_id), ...]}
+        self.track_history = {}  # {track_id: TrackBuffer}
         self.trajectory_lengths = {}  # {track_id: float}
         self.grabbed_item_info = None  # Current grabbed item information
         self.frame_count = 0
@@ -55,6 +137,12 @@ class HygieneTracker:
         Returns:
             Updated detections with tracking IDs
         """
+        # Fast path: nothing detected and nothing being tracked, so only the clocks advance
+        if len(detections) == 0 and not self.tracker.tracked_tracks and not self.tracker.lost_tracks:
+            self.tracker.frame_id += 1
+            self.frame_count += 1
+            return detections
+        
         # Update tracks
         detections = self.tracker.update_with_detections(detections)
         
@@ -68,52 +156,38 @@ class HygieneTracker:
         """Update track history for trajectory analysis"""
         self.frame_count += 1
         
-        if len(detections) == 0:
+        if len(detections) == 0 or detections.tracker_id is None:
             return
         
-        # Update history for each track
-        for i in range(len(detections)):
-            track_id = detections.tracker_id[i]
-            if track_id is not None:
-                # Get bounding box center
-                bbox = detections.xyxy[i]
-                x = (bbox[0] + bbox[2]) / 2
-                y = (bbox[1] + bbox[3]) / 2
-                class_id = detections.class_id[i]
-                
-                # Initialize track history if not exists
-                if track_id not in self.track_history:
-                    self.track_history[track_id] = []
-                
-                # Add current position to history
-                self.track_history[track_id].append((self.frame_count, x, y, class_id))
-                
-                # Limit history length
-                if len(self.track_history[track_id]) > TRAJECTORY_HISTORY_LENGTH:
-                    self.track_history[track_id].pop(0)
-                
-                # Calculate trajectory length
-                self._calculate_trajectory_length(track_id)
+        # Get bounding box centers for all detections at once
+        xyxy = detections.xyxy
+        centers_x = (xyxy[:, 0] + xyxy[:, 2]) * 0.5
+        centers_y = (xyxy[:, 1] + xyxy[:, 3]) * 0.5
         
+        # Route each center into its track history
+        track_history = self.track_history
+        for track_id, x, y, class_id in zip(detections.tracker_id, centers_x, centers_y, detections.class_id):
+            if track_id is None:
+                continue
+            
+            # Initialize track history if not exists
+            history = track_history.get(track_id)
+            if history is None:
+                history = track_history[track_id] = TrackBuffer(TRAJECTORY_HISTORY_LENGTH)
+            
+            # Add current position to history (oldest is overwritten when full)
+            history.append(self.frame_count, x, y, class_id)
+            
+            # Calculate trajectory length
+            self._calculate_trajectory_length(track_id)
     
     def _calculate_trajectory_length(self, track_id: int):
-        """Calculate trajectory length for a specific track"""
+        """Calculate trajectory length for a specific track (maintained incrementally by its buffer)"""
         if track_id not in self.track_history or len(self.track_history[track_id]) < 2:
             self.trajectory_lengths[track_id] = 0.0
             return
         
-        history = self.track_history[track_id]
-        total_length = 0.0
-        
-        # Calculate distance between consecutive positions
-        for i in range(1, len(history)):
-            prev_x, prev_y = history[i-1][1], history[i-1][2]
-            curr_x, curr_y = history[i][1], history[i][2]
-            
-            distance = np.sqrt((curr_x - prev_x)**2 + (curr_y - prev_y)**2)
-            total_length += distance
-        
-        self.trajectory_lengths[track_id] = total_length
+        self.trajectory_lengths[track_id] = float(self.track_history[track_id].length_total)
     
     
     def _identify_grabbed_item(self):
@@ -122,45 +196,46 @@ class HygieneTracker:
             self.grabbed_item_info = None
             return
         
-        # Filter out hands and find item with longest trajectory
-        candidate_items = []
+        # Filter out hands and find item with longest trajectory in a single pass
+        best_track_id = None
+        best_length = -1.0
+        best_class_id = None
         
         for track_id, trajectory_length in self.trajectory_lengths.items():
-            if track_id in self.track_history:
-                # Get the most recent class_id for this track
-                if self.track_history[track_id]:
-                    class_id = self.track_history[track_id][-1][3]
-                    class_name = self.get_class_names().get(class_id, f'Unknown_{class_id}')
-                    
-                    # Skip hands by class name instead of class_id
-                    if class_name == 'hand':
-                        continue
-                    
-                    # Include all items, no minimum threshold - we'll compare lengths
-                    candidate_items.append((track_id, trajectory_length, class_id))
+            history = self.track_history.get(track_id)
+            if not history:
+                continue
+            
+            # Get the most recent class_id for this track
+            class_id = history.last_class_id
+            
+            # Skip hands
+            if class_id == self._hand_cls_id:
+                continue
+            
+            # Include all items, no minimum threshold - we'll compare lengths
+            if trajectory_length > best_length:
+                best_track_id = track_id
+                best_length = trajectory_length
+                best_class_id = class_id
         
         # Select item with longest trajectory
-        if candidate_items:
-            # Sort by trajectory length (descending)
-            candidate_items.sort(key=lambda x: x[1], reverse=True)
-            best_track_id, best_length, best_class_id = candidate_items[0]
-            
-            # Get additional info
-            if best_track_id in self.track_history:
-                history = self.track_history[best_track_id]
-                start_frame = history[0][0] if history else self.frame_count
-                end_frame = history[-1][0] if history else self.frame_count
-                
-                self.grabbed_item_info = {
-                    'track_id': best_track_id,
-                    'class_id': best_class_id,
-                    'trajectory_length': best_length,
-                    'start_frame': start_frame,
-                    'end_frame': end_frame,
-                    'duration_frames': end_frame - start_frame + 1
-                }
-        else:
+        if best_track_id is None:
             self.grabbed_item_info = None
+            return
+        
+        history = self.track_history[best_track_id]
+        start_frame = history.first_frame
+        end_frame = history.last_frame
+        
+        self.grabbed_item_info = {
+            'track_id': best_track_id,
+            'class_id': best_class_id,
+            'trajectory_length': best_length,
+            'start_frame': start_frame,
+            'end_frame': end_frame,
+            'duration_frames': end_frame - start_frame + 1
+        }
     
     def get_grabbed_item_info(self) -> Optional[Dict]:
         """Get information about the currently identified grabbed item"""
@@ -170,7 +245,8 @@ class HygieneTracker:
         """Get position history for a specific track (for visualization)"""
         if track_id in self.track_history:
             # Return only x, y coordinates for visualization
-            return [(int(pos[1]), int(pos[2])) for pos in self.track_history[track_id]]
+            x, y = self.track_history[track_id].get_view()
+            return [(int(px), int(py)) for px, py in zip(x, y)]
         return []
     
     def get_trajectory_length(self, track_id: int) -> float:
@@ -179,7 +255,5 @@ class HygieneTracker:
     
     def get_class_names(self) -> Dict[int, str]:
         """Get class names dictionary from detector"""
-        if self.detector:
-            return self.detector.get_class_names()
-        return {}
+        return self._class_names
     
@@ -3,38 +3,72 @@ Video Processing Utilities
 """
 
 import cv2
+import queue
+import threading
 import numpy as np
 import supervision as sv
-from typing import Generator, Tuple, Optional
+from typing import Any, Dict, Generator, Iterable, List, Tuple, Optional
+from fractions import Fraction
 from pathlib import Path
 import time
 
+try:
+    import decord  # Optional: NVDEC hardware decoding
+except ImportError:
+    decord = None
+
+try:
+    import av  # Optional: NVENC hardware encoding
+except ImportError:
+    av = None
+
 class VideoProcessor:
     """Video processing utilities for hygiene products detection and tracking"""
     
-    def __init__(self, video_path: str, output_path: str = None):
+    # Number of frames fetched per decord get_batch call
+    DECODE_CHUNK_SIZE = 16
+    
+    # Rotation OpenCV applies for each orientation metadata angle; decord
+    # ignores the metadata, so NVDEC frames get the same cv2.rotate
+    ROTATE_CODES = {
+        90: cv2.ROTATE_90_CLOCKWISE,
+        180: cv2.ROTATE_180,
+        270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+    }
+    
+    def __init__(self, video_path: str, output_path: str = None, 
+                 hw_decode: bool = False, hw_encode: bool = False):
         """
         Initialize video processor
         
         Args:
             video_path: Path to input video
             output_path: Path for output video (optional)
+            hw_decode: Decode with NVDEC via decord when available
+            hw_encode: Encode with NVENC via PyAV when available
         """
         self.video_path = Path(video_path)
         self.output_path = Path(output_path) if output_path else None
+        self.hw_decode = hw_decode
+        self.hw_encode = hw_encode
         
         # Video info
         self.video_info = None
+        self.rotation = 0  # Orientation metadata in degrees, applied by OpenCV on decode
         self._load_video_info()
         
         # Video capture and writer
         self.cap = None
         self.writer = None
+        self.nvenc_stream = None  # Set when self.writer is a PyAV container
         
     def _load_video_info(self):
         """Load video information"""
         try:
             self.video_info = sv.VideoInfo.from_video_path(str(self.video_path))
+            cap = cv2.VideoCapture(str(self.video_path))
+            self.rotation = int(cap.get(cv2.CAP_PROP_ORIENTATION_META)) % 360
+            cap.release()
             print(f" Video loaded: {self.video_info.width}x{self.video_info.height}, "
                   f"{self.video_info.fps:.2f} FPS, {self.video_info.total_frames} frames")
         except Exception as e:
@@ -51,23 +85,93 @@ class VideoProcessor:
         Yields:
             Tuple of (frame_number, frame)
         """
+        if self.hw_decode:
+            video_reader = self._open_hw_reader()
+            if video_reader is not None:
+                yield from self._hw_frame_generator(video_reader, frame_skip)
+                return
+        
+        yield from self._cv2_frame_generator(frame_skip)
+    
+    def _open_hw_reader(self) -> Optional[object]:
+        """Open a decord GPU video reader, or return None to fall back to OpenCV"""
+        if decord is None:
+            print(" decord not installed, using OpenCV decoding")
+            return None
+        
+        if self.rotation and self.rotation not in self.ROTATE_CODES:
+            print(f" Unsupported rotation metadata ({self.rotation}), using OpenCV decoding")
+            return None
+        
+        try:
+            video_reader = decord.VideoReader(str(self.video_path), ctx=decord.gpu(0))
+        except Exception as e:
+            print(f" NVDEC unavailable ({e}), using OpenCV decoding")
+            return None
+        
+        print(" Using NVDEC hardware decoding")
+        return video_reader
+    
+    def _hw_frame_generator(self, video_reader: object, 
+                            frame_skip: int) -> Generator[Tuple[int, np.ndarray], None, None]:
+        """Generate frames decoded by decord, fetching only the kept frames"""
+        frame_indices = list(range(0, len(video_reader), frame_skip))
+        rotate_code = self.ROTATE_CODES.get(self.rotation)
+        
+        for start in range(0, len(frame_indices), self.DECODE_CHUNK_SIZE):
+            chunk = frame_indices[start:start + self.DECODE_CHUNK_SIZE]
+            frames = video_reader.get_batch(chunk).asnumpy()
+            
+            for frame_num, frame in zip(chunk, frames):
+                # decord decodes to RGB, rest of the pipeline expects BGR like OpenCV
+                frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+                if rotate_code is not None:
+                    frame = cv2.rotate(frame, rotate_code)
+                yield frame_num, frame
+    
+    def _cv2_frame_generator(self, frame_skip: int) -> Generator[Tuple[int, np.ndarray], None, None]:
+        """Generate frames decoded by OpenCV"""
         self.cap = cv2.VideoCapture(str(self.video_path))
         
         frame_count = 0
         while True:
-            ret, frame = self.cap.read()
-            if not ret:
-                break
-                
             if frame_count % frame_skip == 0:
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
                 yield frame_count, frame
+            elif not self.cap.grab():
+                # Skipped frames are only grabbed, never retrieved and converted to BGR
+                break
                 
             frame_count += 1
         
         self.cap.release()
     
+    def get_batch_generator(self, frame_skip: int = 1, 
+                            batch_size: int = 1) -> Generator[List[Tuple[int, np.ndarray]], None, None]:
+        """
+        Generate batches of frames from video
+        
+        Args:
+            frame_skip: Process every Nth frame
+            batch_size: Number of frames per batch (last batch may be smaller)
+            
+        Yields:
+            List of (frame_number, frame) tuples
+        """
+        batch = []
+        for frame_num, frame in self.get_frame_generator(frame_skip=frame_skip):
+            batch.append((frame_num, frame))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        
+        if batch:
+            yield batch
+    
     def setup_video_writer(self, output_path: str, fps: int = 30, 
-                          width: int = None, height: int = None) -> cv2.VideoWriter:
+                          width: int = None, height: int = None) -> object:
         """
         Setup video writer for output
         
@@ -78,30 +182,76 @@ class VideoProcessor:
             height: Output height (uses input height if None)
             
         Returns:
-            VideoWriter instance
+            VideoWriter instance (PyAV container when encoding with NVENC)
         """
         if width is None:
             width = self.video_info.width
         if height is None:
             height = self.video_info.height
-            
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        self.writer = cv2.VideoWriter(
-            str(output_path), fourcc, fps, (width, height)
-        )
+        
+        self.writer = None
+        if self.hw_encode:
+            self.writer = self._setup_nvenc_writer(output_path, fps, (width, height))
+        
+        if self.writer is None:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            self.writer = cv2.VideoWriter(
+                str(output_path), fourcc, fps, (width, height)
+            )
         
         print(f"Video writer setup: {width}x{height} @ {fps} FPS")
         return self.writer
     
+    def _setup_nvenc_writer(self, output_path: str, fps: float, 
+                            size: Tuple[int, int]) -> Optional[object]:
+        """Open a PyAV container with an h264_nvenc stream, or return None to fall back to OpenCV"""
+        if av is None:
+            print(" PyAV not installed, using OpenCV encoding")
+            return None
+        
+        container = None
+        try:
+            container = av.open(str(output_path), mode='w')
+            stream = container.add_stream('h264_nvenc', rate=Fraction(fps).limit_denominator(1001))
+            stream.width, stream.height = size
+            stream.pix_fmt = 'yuv420p'
+            # Open the encoder now so a missing GPU is detected before any frame is written
+            stream.codec_context.open()
+        except Exception as e:
+            print(f" NVENC unavailable ({e}), using OpenCV encoding")
+            if container is not None:
+                try:
+                    container.close()
+                except Exception:
+                    pass
+            return None
+        
+        print(" Using NVENC hardware encoding")
+        self.nvenc_stream = stream
+        return container
+    
     def write_frame(self, frame: np.ndarray):
         """Write frame to output video"""
-        if self.writer is not None:
+        if self.writer is None:
+            return
+        
+        if self.nvenc_stream is not None:
+            video_frame = av.VideoFrame.from_ndarray(frame, format='bgr24').reformat(format='yuv420p')
+            self.writer.mux(self.nvenc_stream.encode(video_frame))
+        else:
             self.writer.write(frame)
     
     def close_writer(self):
         """Close video writer"""
         if self.writer is not None:
-            self.writer.release()
+            if self.nvenc_stream is not None:
+                # Flush frames still buffered in the encoder
+                self.writer.mux(self.nvenc_stream.encode())
+                self.writer.close()
+                self.nvenc_stream = None
+            else:
+                self.writer.release()
+            self.writer = None
             print("Video writer closed")
     
     def get_video_dimensions(self) -> Tuple[int, int]:
@@ -116,14 +266,137 @@ class VideoProcessor:
         """Get total number of frames"""
         return self.video_info.total_frames
 
+class ThreadedFrameReader:
+    """Decode frames on a background thread so decoding overlaps with inference"""
+    
+    _END = object()
+    
+    def __init__(self, source: Iterable[Any], queue_size: int = 8):
+        """
+        Initialize threaded frame reader
+        
+        Args:
+            source: Frame (or batch) generator, e.g. VideoProcessor.get_frame_generator()
+            queue_size: Maximum number of decoded items buffered ahead of the consumer
+        """
+        self.source = source
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._error = None
+        
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        """Push items from the source into the queue until exhausted or stopped"""
+        try:
+            for item in self.source:
+                if not self._put(item):
+                    break
+        except Exception as e:
+            self._error = e
+        finally:
+            if hasattr(self.source, 'close'):
+                self.source.close()
+            self._put(self._END)
+    
+    def _put(self, item: Any) -> bool:
+        """Put item into the queue, giving up if the reader was stopped"""
+        while not self._stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def __iter__(self) -> Generator[Any, None, None]:
+        while True:
+            item = self.queue.get()
+            if item is self._END:
+                break
+            yield item
+        
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+    
+    def stop(self):
+        """Stop decoding and wait for the reader thread to exit"""
+        self._stop_event.set()
+        self._thread.join()
+
+class ThreadedWriter:
+    """Encode frames on a background thread so encoding overlaps with inference"""
+    
+    _END = object()
+    
+    def __init__(self, processor: VideoProcessor, queue_size: int = 8):
+        """
+        Initialize threaded writer
+        
+        Args:
+            processor: Video processor with its video writer already set up
+            queue_size: Maximum number of frames waiting to be encoded
+        """
+        self.processor = processor
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        """Write frames from the queue until the end marker arrives"""
+        while True:
+            frame = self.queue.get()
+            if frame is self._END:
+                break
+            if self._error is not None:
+                continue
+            try:
+                self.processor.write_frame(frame)
+            except Exception as e:
+                self._error = e
+    
+    def write(self, frame: np.ndarray):
+        """Queue frame for writing"""
+        if self._error is not None:
+            raise self._error
+        self.queue.put(frame)
+    
+    def close(self):
+        """Flush queued frames and wait for the writer thread to exit"""
+        if self._thread.is_alive():
+            self.queue.put(self._END)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
 class VideoAnnotator:
     """Video annotation utilities"""
     
-    def __init__(self):
-        """Initialize video annotator"""
-        self.box_annotator = sv.BoxAnnotator(thickness=4)
-        self.label_annotator = sv.LabelAnnotator(text_thickness=2, text_scale=1.5, text_color=sv.Color.BLACK)
-        self.trace_annotator = sv.TraceAnnotator(thickness=4, trace_length=50)
+    def __init__(self, class_names: Optional[Dict[int, str]] = None):
+        """
+        Initialize video annotator
+        
+        Args:
+            class_names: Class names by class_id (resolved from the detector if None)
+        """
+        # Class name by class_id, so labels need no dict lookups per detection
+        self._name_lut = self._build_name_lut(class_names) if class_names else None
+        
+        # Same look as sv.BoxAnnotator / LabelAnnotator / TraceAnnotator, drawn in one pass
+        self.box_thickness = 4
+        self.text_thickness = 2
+        self.text_scale = 1.5
+        self.text_padding = 10
+        self.text_color = sv.Color.BLACK.as_bgr()
+        self.trace_thickness = 4
+        self.trace_length = 50
+        
+        # BGR colors by class_id (modulo palette size, like sv.ColorLookup.CLASS)
+        self._class_colors = [color.as_bgr() for color in sv.ColorPalette.DEFAULT.colors]
         # No counting line annotator needed
     
     def annotate_frame(self, 
@@ -134,8 +407,11 @@ class VideoAnnotator:
         """
         Annotate frame with detections and tracking info
         
+        The frame is drawn on in place: callers own a fresh decoded frame
+        per call and only write the result out, so no copy is made.
+        
         Args:
-            frame: Input frame
+            frame: Input frame (modified in place)
             detections: Detection results
             detector: Detector instance for class names
             tracker: Tracker instance for track history
@@ -143,29 +419,69 @@ class VideoAnnotator:
         Returns:
             Annotated frame
         """
-        # Annotate frame
-        if len(detections) > 0:
-            # Create labels using zip 
-            labels = [
-                f"#{tracker_id} {detector.get_class_names().get(class_id, 'Unknown') if detector else f'Class_{class_id}'} {confidence:0.2f}"
-                for confidence, class_id, tracker_id
-                in zip(detections.confidence, detections.class_id, detections.tracker_id)
-                if tracker_id is not None and class_id is not None and confidence is not None
-            ]
-            
-            # Use original notebook annotation order
-            annotated_frame = frame.copy()
-            annotated_frame = self.trace_annotator.annotate(scene=annotated_frame, detections=detections)
-            annotated_frame = self.box_annotator.annotate(scene=annotated_frame, detections=detections)
-            annotated_frame = self.label_annotator.annotate(scene=annotated_frame, detections=detections, labels=labels)
-            
-            # Add grabbed item visualization if tracker is provided
-            if tracker is not None:
-                annotated_frame = self._add_grabbed_item_visualization(annotated_frame, tracker, detector)
-            
-            return annotated_frame
+        # Nothing to draw (grabbed item overlay is only shown alongside detections)
+        if len(detections) == 0:
+            return frame
         
-        return frame
+        if self._name_lut is None and detector is not None:
+            self._name_lut = self._build_name_lut(detector.get_class_names())
+        name_lut = self._name_lut
+        
+        # Create labels using zip (None for untracked detections)
+        labels = [
+            f"#{tracker_id} {name_lut[class_id] if name_lut else f'Class_{class_id}'} {confidence:0.2f}"
+            if tracker_id is not None else None
+            for confidence, class_id, tracker_id
+            in zip(detections.confidence, detections.class_id, detections.tracker_id)
+        ]
+        
+        # Traces, boxes, then labels on top
+        annotated_frame = self._draw_all(frame, detections, labels, tracker)
+        
+        # Add grabbed item visualization if tracker is provided
+        if tracker is not None:
+            annotated_frame = self._add_grabbed_item_visualization(annotated_frame, tracker, detector)
+        
+        return annotated_frame
+    
+    @staticmethod
+    def _build_name_lut(class_names: Dict[int, str]) -> List[str]:
+        """Build list of class names indexed by class_id"""
+        return [class_names.get(class_id, 'Unknown') for class_id in range(max(class_names) + 1)]
+    
+    def _draw_all(self, scene: np.ndarray, detections: sv.Detections, 
+                  labels: list, tracker: Optional[object]) -> np.ndarray:
+        """Draw traces, bounding boxes and labels with cv2, layered like the supervision annotators"""
+        track_history = getattr(tracker, 'track_history', {})
+        num_colors = len(self._class_colors)
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        boxes = detections.xyxy.astype(int)
+        colors = [self._class_colors[class_id % num_colors] for class_id in detections.class_id]
+        
+        # Traces of recent box centers, underneath every box
+        for tracker_id, color in zip(detections.tracker_id, colors):
+            history = track_history.get(tracker_id) if tracker_id is not None else None
+            if history is not None and len(history) > 1:
+                x, y = history.get_view()
+                points = np.column_stack((x[-self.trace_length:], y[-self.trace_length:])).astype(np.int32)
+                cv2.polylines(scene, [points], False, color, self.trace_thickness)
+        
+        # Bounding boxes
+        for (x1, y1, x2, y2), color in zip(boxes, colors):
+            cv2.rectangle(scene, (x1, y1), (x2, y2), color, self.box_thickness)
+        
+        # Labels last so overlapping boxes and traces never cover them
+        for (x1, y1, _, _), color, label in zip(boxes, colors, labels):
+            if label is None:
+                continue
+            (text_w, text_h), _ = cv2.getTextSize(label, font, self.text_scale, self.text_thickness)
+            background_top = y1 - text_h - 2 * self.text_padding
+            cv2.rectangle(scene, (x1, background_top), (x1 + text_w + 2 * self.text_padding, y1),
+                          color, -1)
+            cv2.putText(scene, label, (x1 + self.text_padding, y1 - self.text_padding), font,
+                        self.text_scale, self.text_color, self.text_thickness, cv2.LINE_AA)
+        
+        return scene
     
     def _add_grabbed_item_visualization(self, frame: np.ndarray, tracker: object, detector: object) -> np.ndarray:
         """Add visualization for grabbed item detection"""
@@ -191,7 +507,7 @@ class VideoAnnotator:
                     cv2.polylines(frame, [points], False, (0, 0, 255), 3)
                 
                 # Add text overlay for grabbed item info
-                class_name = detector.get_class_names().get(class_id, 'Unknown') if detector else f'Class_{class_id}'
+                class_name = self._name_lut[class_id] if self._name_lut else f'Class_{class_id}'
                 info_text = f"Grabbed: {class_name} #{track_id}"
                 length_text = f"Trajectory: {trajectory_length:.1f}px"
                 